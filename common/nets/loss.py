@@ -5,18 +5,70 @@
 # LICENSE file in the root directory of this source tree.
 # 
 
+import math
 import torch
 import torch.nn as nn
-from pytorch3d.transforms import axis_angle_to_matrix, matrix_to_axis_angle
+
+# identity matrices per (device, dtype), so that they are not re-allocated at every call
+_eye_cache = {}
+
+def _eye3(device, dtype):
+    key = (device, dtype)
+    if key not in _eye_cache:
+        _eye_cache[key] = torch.eye(3, device=device, dtype=dtype)
+    return _eye_cache[key]
+
+def axis_angle_to_matrix(axis_angle):
+    # Rodrigues' formula in the closed form R = cos(t)*I + sin(t)/t*K + (1-cos(t))/t^2*aa^T
+    # sinc keeps both coefficients finite at t=0, so no branch for small angles is needed
+    # works on any leading batch dimensions (..., 3) -> (..., 3, 3) without flattening them
+    angle = torch.norm(axis_angle, dim=-1)[...,None,None] # ..., 1, 1
+
+    x, y, z = axis_angle.unbind(-1)
+    zero = torch.zeros_like(x)
+    K = torch.stack((zero, -z, y,
+                    z, zero, -x,
+                    -y, x, zero),-1).unflatten(-1,(3,3))
+    outer = axis_angle[...,:,None] * axis_angle[...,None,:]
+    I = _eye3(axis_angle.device, axis_angle.dtype) # broadcast over the batch
+
+    R = torch.cos(angle) * I + torch.sinc(angle / math.pi) * K + 0.5 * torch.sinc(angle / (2 * math.pi)) ** 2 * outer
+    return R
+
+def matrix_to_axis_angle(matrix):
+    # t = atan2(|w|, tr-1) with w = 2*sin(t)*axis, so axis*t = 0.5*w/sinc(t)
+    omegas = torch.stack((matrix[...,2,1] - matrix[...,1,2],
+                        matrix[...,0,2] - matrix[...,2,0],
+                        matrix[...,1,0] - matrix[...,0,1]),-1)
+    norms = torch.norm(omegas, dim=-1, keepdim=True)
+    traces = matrix.diagonal(dim1=-2, dim2=-1).sum(-1, keepdim=True)
+    angles = torch.atan2(norms, traces - 1)
+
+    # w and sinc(t) both vanish as t -> pi, so for t > pi/2 the axis is taken from the symmetric part instead:
+    # (R+R^T)/2 - cos(t)*I = (1-cos(t))*axis*axis^T. its row of the largest diagonal is the best-conditioned one
+    # and its sign is taken from w (ambiguous only at t = pi exactly, where both signs are the same rotation)
+    near_pi = angles > math.pi / 2
+    sym = 0.5 * (matrix + matrix.transpose(-1,-2)) - 0.5 * (traces - 1)[...,None] * _eye3(matrix.device, matrix.dtype)
+    row_idx = sym.diagonal(dim1=-2, dim2=-1).argmax(-1, keepdim=True)[...,None].expand(*sym.shape[:-2],1,3)
+    axes = torch.gather(sym, -2, row_idx).squeeze(-2)
+    axes = axes * (1 - 2 * ((axes * omegas).sum(-1, keepdim=True) < 0).to(axes.dtype))
+    axes_norms = torch.norm(axes, dim=-1, keepdim=True)
+
+    # the unused branch gets a denominator of 1, so that neither the output nor its gradient becomes nan
+    ones = torch.ones_like(angles)
+    sincs = torch.where(near_pi, ones, torch.sinc(angles / math.pi))
+    axes_norms = torch.where(near_pi, axes_norms, ones)
+    return torch.where(near_pi, angles * axes / axes_norms, 0.5 * omegas / sincs)
 
 class CoordLoss(nn.Module):
     def __init__(self):
         super(CoordLoss, self).__init__()
 
     def forward(self, coord_out, coord_gt, valid, is_3D):
-        loss = torch.abs(coord_out - coord_gt) * valid
-        loss_z = loss[:,:,2:] * is_3D[:,None,None].float()
-        loss = torch.cat((loss[:,:,:2], loss_z),2)
+        # mask z-axis loss of 2D-only samples with a per-axis weight instead of slicing and concatenating
+        is_3D = is_3D.float()
+        axis_weight = torch.stack((torch.ones_like(is_3D), torch.ones_like(is_3D), is_3D),1)[:,None,:] # batch_size, 1, 3
+        loss = torch.abs(coord_out - coord_gt) * valid * axis_weight
         return loss
 
 class PoseLoss(nn.Module):
@@ -29,15 +81,10 @@ class PoseLoss(nn.Module):
         pose_out = pose_out.view(batch_size,-1,3)
         pose_gt = pose_gt.view(batch_size,-1,3)
 
-        #pose_out = matrix_to_axis_angle(axis_angle_to_matrix(pose_out))
-        #pose_gt = matrix_to_axis_angle(axis_angle_to_matrix(pose_gt))
-
-        #loss = torch.abs(pose_out - pose_gt) * pose_valid[:,:,None]
-
-        pose_out = axis_angle_to_matrix(pose_out)
-        pose_gt = axis_angle_to_matrix(pose_gt)
-
-        loss = torch.abs(pose_out - pose_gt) * pose_valid[:,:,None,None]
+        # geodesic distance on SO(3): the angle of the relative rotation R_out * R_gt^T.
+        # unlike L1 on the axis-angle vectors, it is continuous where t*axis and -t*axis (t ~ pi) are the same rotation
+        rel_rot = torch.matmul(axis_angle_to_matrix(pose_out), axis_angle_to_matrix(pose_gt).transpose(-1,-2))
+        loss = torch.norm(matrix_to_axis_angle(rel_rot), dim=-1) * pose_valid # batch_size, joint_num
         return loss
 
 
@@ -16,8 +16,10 @@ from utils.transforms import cam2pixel, transform_joint_to_other_db
 from plyfile import PlyData, PlyElement
 import torch
 
-def load_img(path, order='RGB'):
-    img = cv2.imread(path, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+def load_img(path, order='RGB', reduce_factor=1):
+    # reduce_factor (1, 2, 4, or 8) lets the decoder downscale the image directly, which is much faster than decoding the full image for large JPEGs
+    read_flag = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[reduce_factor]
+    img = cv2.imread(path, read_flag | cv2.IMREAD_IGNORE_ORIENTATION)
     if not isinstance(img, np.ndarray):
         raise IOError("Fail to read %s" % path)
 
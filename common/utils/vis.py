@@ -26,50 +26,49 @@ MeshRendererWithFragments,
 MeshRasterizer,
 TexturesVertex)
 
+# rainbow colors (0-255 BGR tuples for opencv) for each number of colors
+_palette_cache = {}
+
+def _bgr_palette(n):
+    if n not in _palette_cache:
+        # Convert from plt 0-1 RGBA colors to 0-255 BGR colors for opencv.
+        rgba = plt.get_cmap('rainbow')(np.linspace(0, 1, n + 2))
+        _palette_cache[n] = [tuple(c) for c in (rgba[:,[2,1,0]] * 255).tolist()]
+    return _palette_cache[n]
+
 def vis_keypoints_with_skeleton(img, kps, kps_lines, color=None):
     skeleton_num = len(kps_lines)
     if color is None:
-        # Convert from plt 0-1 RGBA colors to 0-255 BGR colors for opencv.
-        cmap = plt.get_cmap('rainbow')
-        colors = [cmap(i) for i in np.linspace(0, 1, len(kps_lines) + 2)]
-        colors = [(c[2] * 255, c[1] * 255, c[0] * 255) for c in colors]
-    colors = [color for _ in range(skeleton_num)]
+        colors = _bgr_palette(len(kps_lines))
+    else:
+        colors = [color for _ in range(skeleton_num)]
 
-    # Perform the drawing on a copy of the image, to allow for blending.
+    # Perform the drawing on a copy of the image, so the input image is left untouched.
     kp_mask = np.copy(img)
 
-    # Draw the keypoints.
-    for l in range(len(kps_lines)):
-        i1 = kps_lines[l][0]
-        i2 = kps_lines[l][1]
-        p1 = kps[i1,0].astype(np.int32), kps[i1,1].astype(np.int32)
-        p2 = kps[i2,0].astype(np.int32), kps[i2,1].astype(np.int32)
-        cv2.line(
-            kp_mask, p1, p2,
-            color=colors[l], thickness=2, lineType=cv2.LINE_AA)
-        cv2.circle(
-            kp_mask, p1,
-            radius=3, color=colors[l], thickness=-1, lineType=cv2.LINE_AA)
-        cv2.circle(
-            kp_mask, p2,
-            radius=3, color=colors[l], thickness=-1, lineType=cv2.LINE_AA)
+    # Draw the keypoints. Bones sharing a color are drawn with a single polylines call.
+    pts = kps[:,:2].astype(np.int32)
+    segments = pts[np.asarray(kps_lines)] # skeleton_num, 2, 2. no copy when kps_lines is already an int array (e.g., mano.sh_skeleton_arr)
+    for c in dict.fromkeys(colors[:skeleton_num]):
+        line_idx = [l for l in range(skeleton_num) if colors[l] == c]
+        cv2.polylines(kp_mask, list(segments[line_idx]), isClosed=False, color=c, thickness=2, lineType=cv2.LINE_AA)
+        for p in np.unique(segments[line_idx].reshape(-1,2), axis=0):
+            cv2.circle(
+                kp_mask, (int(p[0]), int(p[1])),
+                radius=3, color=c, thickness=-1, lineType=cv2.LINE_AA)
 
-    # Blend the keypoints.
-    return cv2.addWeighted(img, 0.0, kp_mask, 1.0, 0)
+    return kp_mask
 
 def vis_keypoints(img, kps, alpha=1):
-    # Convert from plt 0-1 RGBA colors to 0-255 BGR colors for opencv.
-    cmap = plt.get_cmap('rainbow')
-    colors = [cmap(i) for i in np.linspace(0, 1, len(kps) + 2)]
-    colors = [(c[2] * 255, c[1] * 255, c[0] * 255) for c in colors]
+    colors = _bgr_palette(len(kps))
 
     # Perform the drawing on a copy of the image, to allow for blending.
     kp_mask = np.copy(img)
 
     # Draw the keypoints.
-    for i in range(len(kps)):
-        p = kps[i][0].astype(np.int32), kps[i][1].astype(np.int32)
-        cv2.circle(kp_mask, p, radius=3, color=colors[i], thickness=-1, lineType=cv2.LINE_AA)
+    pts = kps[:,:2].astype(np.int32).tolist()
+    for i in range(len(pts)):
+        cv2.circle(kp_mask, tuple(pts[i]), radius=3, color=colors[i], thickness=-1, lineType=cv2.LINE_AA)
 
     # Blend the keypoints.
     return cv2.addWeighted(img, 1.0 - alpha, kp_mask, alpha, 0)
@@ -96,10 +95,8 @@ def vis_3d_skeleton(kpt_3d, kps_lines, filename=None):
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
 
-    # Convert from plt 0-1 RGBA colors to 0-255 BGR colors for opencv.
-    cmap = plt.get_cmap('rainbow')
-    colors = [cmap(i) for i in np.linspace(0, 1, len(kps_lines) + 2)]
-    colors = [np.array((c[2], c[1], c[0])) for c in colors]
+    # 0-1 BGR colors, the same as the ones of the 2D visualization
+    colors = [np.array(c) / 255 for c in _bgr_palette(len(kps_lines))]
 
     for l in range(len(kps_lines)):
         i1 = kps_lines[l][0]
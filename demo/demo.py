@@ -30,10 +30,11 @@ if not hasattr(np, 'str'):
 import cv2
 import json
 import torch
+from PIL import Image
 from glob import glob
 from tqdm import tqdm
-import torchvision.transforms as transforms
-from torch.nn.parallel.data_parallel import DataParallel
+from torch.utils.data import DataLoader
+from torch.utils.data.dataset import Dataset
 import torch.backends.cudnn as cudnn
 
 sys.path.insert(0, osp.join('..', 'main'))
@@ -45,9 +46,49 @@ from utils.preprocessing import load_img, process_bbox, generate_patch_image, ge
 from utils.vis import vis_keypoints_with_skeleton, save_obj, render_mesh_orthogonal
 from utils.mano import mano
 
+class DemoDataset(Dataset):
+    def __init__(self, img_path_list, reduce_decode=False):
+        self.img_path_list = img_path_list
+        self.reduce_decode = reduce_decode
+
+    def __len__(self):
+        return len(self.img_path_list)
+
+    def __getitem__(self, idx):
+        img_path = self.img_path_list[idx]
+        file_name = img_path.split('/')[-1][:-4]
+
+        # load image and make its aspect ratio follow cfg.input_img_shape
+        # optionally, large images are decoded at a reduced size, as long as it still covers cfg.input_img_shape.
+        # the outputs (box, skeleton, and mesh renders) are then saved at that reduced resolution
+        reduce_factor = 1
+        if self.reduce_decode:
+            with Image.open(img_path) as f: # reads the header only
+                img_width, img_height = f.size
+            while reduce_factor < 8 and img_height // (reduce_factor * 2) >= cfg.input_img_shape[0] and img_width // (reduce_factor * 2) >= cfg.input_img_shape[1]:
+                reduce_factor *= 2
+        original_img = load_img(img_path, reduce_factor=reduce_factor)
+        img_height, img_width = original_img.shape[:2]
+        bbox = [0, 0, img_width, img_height]
+        bbox = process_bbox(bbox, img_width, img_height)
+        img, img2bb_trans, bb2img_trans = generate_patch_image(original_img, bbox, 1.0, 0.0, False, cfg.input_img_shape)
+        img = torch.from_numpy(img).permute(2,0,1).contiguous().div_(255) # generate_patch_image already returns float32
+        original_img = original_img.astype(np.uint8) # lossless (decoded from 8-bit) and 4x less worker-to-main process traffic than float32
+        return {'img': img, 'original_img': original_img, 'bbox': bbox, 'bb2img_trans': bb2img_trans, 'file_name': file_name}
+
+def demo_collate(batch):
+    # input patches share cfg.input_img_shape and are stacked. the others (e.g., original images of different sizes) are kept as lists
+    data = {'img': torch.stack([d['img'] for d in batch])}
+    for k in ('original_img', 'bbox', 'bb2img_trans', 'file_name'):
+        data[k] = [d[k] for d in batch]
+    return data
+
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument('--gpu', type=str, dest='gpu_ids')
+    parser.add_argument('--reduce_decode', action='store_true', dest='reduce_decode') # decode large images at 1/2-1/8 resolution. outputs are saved at that resolution
+    parser.add_argument('--compile', action='store_true', dest='compile') # torch.compile the model. only pays off for many images, as compiling takes a while
+    parser.add_argument('--batch_size', type=int, default=4, dest='batch_size') # small, so that even few images are spread over several workers and batches
     args = parser.parse_args()
 
     assert args.gpu_ids, "Please set proper gpu ids"
@@ -68,11 +109,14 @@ cudnn.benchmark = True
 model_path = './snapshot_6.pth'
 assert osp.exists(model_path), 'Cannot find model at ' + model_path
 print('Load checkpoint from {}'.format(model_path))
-model = get_model('test')
-model = DataParallel(model).cuda()
+model = get_model('test').cuda() # single GPU, so no DataParallel wrapper and its per-call scatter/gather
 ckpt = torch.load(model_path)
-model.load_state_dict(ckpt['network'], strict=False)
+network = {(k[len('module.'):] if k.startswith('module.') else k): v for k,v in ckpt['network'].items()} # snapshots are saved from DataParallel
+model.load_state_dict(network, strict=False)
 model.eval()
+if args.compile:
+    assert hasattr(torch, 'compile'), '--compile requires PyTorch >= 2.0'
+    model = torch.compile(model, dynamic=True)
 
 # prepare save paths
 input_img_path = './images'
@@ -86,125 +130,133 @@ os.makedirs(render_save_path, exist_ok=True)
 # load paths of input images
 img_path_list = glob(osp.join(input_img_path, '*.jpg')) + glob(osp.join(input_img_path, '*.jpeg')) + glob(osp.join(input_img_path, '*.png'))
 
-# for each input image
-for img_path in tqdm(img_path_list):
-    file_name = img_path.split('/')[-1][:-4]
-    
-    # load image and make its aspect ratio follow cfg.input_img_shape
-    original_img = load_img(img_path) 
-    img_height, img_width = original_img.shape[:2]
-    bbox = [0, 0, img_width, img_height]
-    bbox = process_bbox(bbox, img_width, img_height)
-    img, img2bb_trans, bb2img_trans = generate_patch_image(original_img, bbox, 1.0, 0.0, False, cfg.input_img_shape)
-    transform = transforms.ToTensor()
-    img = transform(img.astype(np.float32))/255
-    img = img.cuda()[None,:,:,:]
+# decode and preprocess the input images in background workers while the GPU runs the model
+demo_loader = DataLoader(dataset=DemoDataset(img_path_list, args.reduce_decode), batch_size=args.batch_size, shuffle=False, num_workers=cfg.num_thread, pin_memory=True, collate_fn=demo_collate)
+
+host_keys = ['rhand_bbox', 'lhand_bbox', 'rroot_cam', 'rel_trans']
+for h in ('r', 'l'):
+    host_keys += [h + 'hand_bbox_conf', h + 'joint_img', h + 'mano_mesh_cam', h + 'mano_root_pose', h + 'mano_hand_pose', h + 'mano_shape', h + 'root_cam']
+
+# for each batch of input images
+for data in tqdm(demo_loader):
+    img = data['img'].cuda(non_blocking=True) # data['img'] is pinned by the DataLoader
 
     # forward to InterWild
     inputs = {'img': img}
     targets = {}
     meta_info = {}
-    with torch.no_grad():
+    with torch.no_grad(), torch.autocast(device_type='cuda', dtype=torch.float16):
         out = model(inputs, targets, meta_info, 'test')
-    
-    # check IoU between boxes of two hands
-    rhand_bbox = out['rhand_bbox'].cpu().numpy()[0]
-    lhand_bbox = out['lhand_bbox'].cpu().numpy()[0]
-    iou = get_iou(rhand_bbox, lhand_bbox, 'xyxy')
-    if iou > 0:
-        is_th = True
-    else:
-        is_th = False
-
-    # for each right and left hand
-    vis_box = original_img.copy()[:,:,::-1]
-    vis_skeleton = original_img.copy()[:,:,::-1]
-    prev_depth = None
-    render_out = torch.flip(torch.from_numpy(original_img).float().cuda()[None,:,:,:], [3]) # batch_size, img_height, img_width, 3
-    rroot_cam = out['rroot_cam'].cpu().numpy()[0] # 3D position of the right hand root joint (wrist)
-    rel_trans = out['rel_trans'].cpu().numpy()[0] # 3D relative translation between two hands
-    for h in ('right', 'left'):
-        # get outputs
-        hand_bbox = out[h[0] + 'hand_bbox'].cpu().numpy()[0].reshape(2,2) # xyxy
-        hand_bbox_conf = float(out[h[0] + 'hand_bbox_conf'].cpu().numpy()[0]) # bbox confidence
-        joint_img = out[h[0] + 'joint_img'].cpu().numpy()[0] # 2.5D pose
-        mesh = out[h[0] + 'mano_mesh_cam'].cpu().numpy()[0] # root-relative mesh
-        root_pose = out[h[0] + 'mano_root_pose'].cpu().numpy()[0] # MANO root pose
-        hand_pose = out[h[0] + 'mano_hand_pose'].cpu().numpy()[0] # MANO hand pose
-        shape = out[h[0] + 'mano_shape'].cpu().numpy()[0] # MANO shape parameter
-        root_cam = out[h[0] + 'root_cam'].cpu().numpy()[0] # 3D position of the root joint (wrist)
+    out = {k: v.float() for k,v in out.items()} # back to fp32 for the post-processing and rendering
+
+    # copy the outputs needed on the host with a single synchronization instead of one per tensor
+    out_np = {k: out[k].detach().to('cpu', non_blocking=True) for k in host_keys}
+    torch.cuda.synchronize()
+    out_np = {k: v.numpy() for k,v in out_np.items()}
+
+    # for each image in the batch
+    for b in range(len(data['file_name'])):
+        file_name = data['file_name'][b]
+        original_img = data['original_img'][b]
+        img_height, img_width = original_img.shape[:2]
+        bbox = data['bbox'][b]
+        bb2img_trans = data['bb2img_trans'][b]
+
+        # check IoU between boxes of two hands
+        rhand_bbox = out_np['rhand_bbox'][b]
+        lhand_bbox = out_np['lhand_bbox'][b]
+        iou = get_iou(rhand_bbox, lhand_bbox, 'xyxy')
+        if iou > 0:
+            is_th = True
+        else:
+            is_th = False
+
+        # for each right and left hand
+        vis_box = original_img.copy()[:,:,::-1]
+        vis_skeleton = original_img.copy()[:,:,::-1]
+        prev_depth = None
+        render_out = torch.flip(torch.from_numpy(original_img).cuda().float()[None,:,:,:], [3]) # batch_size, img_height, img_width, 3
+        rroot_cam = out_np['rroot_cam'][b] # 3D position of the right hand root joint (wrist)
+        rel_trans = out_np['rel_trans'][b] # 3D relative translation between two hands
+        for h in ('right', 'left'):
+            # get outputs
+            hand_bbox = out_np[h[0] + 'hand_bbox'][b].reshape(2,2) # xyxy
+            hand_bbox_conf = float(out_np[h[0] + 'hand_bbox_conf'][b]) # bbox confidence
+            joint_img = out_np[h[0] + 'joint_img'][b] # 2.5D pose
+            mesh = out_np[h[0] + 'mano_mesh_cam'][b] # root-relative mesh
+            root_pose = out_np[h[0] + 'mano_root_pose'][b] # MANO root pose
+            hand_pose = out_np[h[0] + 'mano_hand_pose'][b] # MANO hand pose
+            shape = out_np[h[0] + 'mano_shape'][b] # MANO shape parameter
+            root_cam = out_np[h[0] + 'root_cam'][b] # 3D position of the root joint (wrist)
         
-        # use rel_trans only when two-hand cases
-        if is_th:
-            if h == 'right':
-                mesh = mesh + rroot_cam[None,:]
+            # use rel_trans only when two-hand cases
+            if is_th:
+                if h == 'right':
+                    mesh = mesh + rroot_cam[None,:]
+                else:
+                    mesh = mesh + rroot_cam[None,:] + rel_trans[None,:]
+                render_focal = out['render_focal'][b:b+1].clone()
+                render_princpt = out['render_princpt'][b:b+1].clone()
             else:
-                mesh = mesh + rroot_cam[None,:] + rel_trans[None,:]
-            render_focal = out['render_focal'].clone()
-            render_princpt = out['render_princpt'].clone()
-        else:
-            mesh = mesh + root_cam
-            render_focal = out['render_' + h[0] + 'focal'].clone()
-            render_princpt = out['render_' + h[0] + 'princpt'].clone()
+                mesh = mesh + root_cam
+                render_focal = out['render_' + h[0] + 'focal'][b:b+1].clone()
+                render_princpt = out['render_' + h[0] + 'princpt'][b:b+1].clone()
             
-        # warp from cfg.input_img_shape to the orignal image space
-        render_focal[:,0] = render_focal[:,0] / cfg.input_img_shape[1] * bbox[2]
-        render_focal[:,1] = render_focal[:,1] / cfg.input_img_shape[0] * bbox[3]
-        render_princpt[:,0] = render_princpt[:,0] / cfg.input_img_shape[1] * bbox[2] + bbox[0]
-        render_princpt[:,1] = render_princpt[:,1] / cfg.input_img_shape[0] * bbox[3] + bbox[1]
-
-        # bbox save
-        hand_bbox[:,0] = hand_bbox[:,0] / cfg.input_body_shape[1] * cfg.input_img_shape[1]
-        hand_bbox[:,1] = hand_bbox[:,1] / cfg.input_body_shape[0] * cfg.input_img_shape[0]
-        hand_bbox_xy1 = np.concatenate((hand_bbox, np.ones_like(hand_bbox[:,:1])),1)
-        hand_bbox = np.dot(bb2img_trans, hand_bbox_xy1.transpose(1,0)).transpose(1,0)
-        if h == 'right':
-            color = (255,0,255) # purple
-        else:
-            color = (102,255,102) # green
-        vis_box = cv2.rectangle(vis_box.copy(), (int(hand_bbox[0,0]), int(hand_bbox[0,1])), (int(hand_bbox[1,0]), int(hand_bbox[1,1])), color, 3)
-
-        # 2D skeleton
-        joint_img_xy1 = np.concatenate((joint_img[:,:2], np.ones_like(joint_img[:,:1])),1)
-        joint_img = np.dot(bb2img_trans, joint_img_xy1.transpose(1,0)).transpose(1,0)
-        if h == 'right':
-            color = (255,0,255) # purple
-        else:
-            color = (102,255,102) # green
-        vis_skeleton = vis_keypoints_with_skeleton(vis_skeleton, joint_img, mano.sh_skeleton, color)
+            # warp from cfg.input_img_shape to the orignal image space
+            render_focal[:,0] = render_focal[:,0] / cfg.input_img_shape[1] * bbox[2]
+            render_focal[:,1] = render_focal[:,1] / cfg.input_img_shape[0] * bbox[3]
+            render_princpt[:,0] = render_princpt[:,0] / cfg.input_img_shape[1] * bbox[2] + bbox[0]
+            render_princpt[:,1] = render_princpt[:,1] / cfg.input_img_shape[0] * bbox[3] + bbox[1]
 
-        # save mesh
-        save_obj(mesh, mano.face[h], osp.join(mesh_save_path, file_name + '_' + h + '.obj'))
+            # bbox save
+            hand_bbox[:,0] = hand_bbox[:,0] / cfg.input_body_shape[1] * cfg.input_img_shape[1]
+            hand_bbox[:,1] = hand_bbox[:,1] / cfg.input_body_shape[0] * cfg.input_img_shape[0]
+            hand_bbox = cv2.transform(hand_bbox.reshape(-1,1,2).astype(np.float32), bb2img_trans).reshape(-1,2)
+            if h == 'right':
+                color = (255,0,255) # purple
+            else:
+                color = (102,255,102) # green
+            vis_box = cv2.rectangle(vis_box.copy(), (int(hand_bbox[0,0]), int(hand_bbox[0,1])), (int(hand_bbox[1,0]), int(hand_bbox[1,1])), color, 3)
 
-        # save MANO parameters
-        with open(osp.join(param_save_path, file_name + '_' + h + '.json'), 'w') as f:
+            # 2D skeleton
+            joint_img = cv2.transform(joint_img[:,None,:2].astype(np.float32), bb2img_trans).reshape(-1,2)
             if h == 'right':
-                json.dump({'root_pose': root_pose.tolist(), 'hand_pose': hand_pose.tolist(), 'shape': shape.tolist(), 'root_trans': [0,0,0]}, f)
+                color = (255,0,255) # purple
             else:
-                 json.dump({'root_pose': root_pose.tolist(), 'hand_pose': hand_pose.tolist(), 'shape': shape.tolist(), 'root_trans': rel_trans.tolist()}, f)
-
-        # render
-        with torch.no_grad():
-            mesh = torch.from_numpy(mesh[None,:,:]).float().cuda()
-            face = torch.from_numpy(mano.face[h][None,:,:].astype(np.int32)).cuda()
-            render_cam_params = {'focal': render_focal, 'princpt': render_princpt}
-            rgb, depth = render_mesh_orthogonal(mesh, face, render_cam_params, (img_height,img_width), h)
-        valid_mask = (depth > 0)
-        if prev_depth is None:
-            render_mask = valid_mask.float()
-            render_out = rgb * render_mask + render_out * (1 - render_mask)
-            prev_depth = depth
-        else:
-            render_mask = (valid_mask * (((depth < prev_depth) + (prev_depth <= 0)) > 0)).float()
-            render_out = rgb * render_mask + render_out * (1 - render_mask)
-            prev_depth = depth * render_mask + prev_depth * (1 - render_mask)
+                color = (102,255,102) # green
+            vis_skeleton = vis_keypoints_with_skeleton(vis_skeleton, joint_img, mano.sh_skeleton_arr, color)
+
+            # save mesh
+            save_obj(mesh, mano.face[h], osp.join(mesh_save_path, file_name + '_' + h + '.obj'))
+
+            # save MANO parameters
+            with open(osp.join(param_save_path, file_name + '_' + h + '.json'), 'w') as f:
+                if h == 'right':
+                    json.dump({'root_pose': root_pose.tolist(), 'hand_pose': hand_pose.tolist(), 'shape': shape.tolist(), 'root_trans': [0,0,0]}, f)
+                else:
+                     json.dump({'root_pose': root_pose.tolist(), 'hand_pose': hand_pose.tolist(), 'shape': shape.tolist(), 'root_trans': rel_trans.tolist()}, f)
+
+            # render
+            with torch.no_grad():
+                mesh = torch.from_numpy(mesh[None,:,:]).float().cuda()
+                face = torch.from_numpy(mano.face[h][None,:,:].astype(np.int32)).cuda()
+                render_cam_params = {'focal': render_focal, 'princpt': render_princpt}
+                rgb, depth = render_mesh_orthogonal(mesh, face, render_cam_params, (img_height,img_width), h)
+            valid_mask = (depth > 0)
+            if prev_depth is None:
+                render_mask = valid_mask.float()
+                render_out = rgb * render_mask + render_out * (1 - render_mask)
+                prev_depth = depth
+            else:
+                render_mask = (valid_mask * (((depth < prev_depth) + (prev_depth <= 0)) > 0)).float()
+                render_out = rgb * render_mask + render_out * (1 - render_mask)
+                prev_depth = depth * render_mask + prev_depth * (1 - render_mask)
  
-    # save box
-    cv2.imwrite(osp.join(render_save_path, file_name + '_box.jpg'), vis_box)
+        # save box
+        cv2.imwrite(osp.join(render_save_path, file_name + '_box.jpg'), vis_box)
 
-    # save 2D skeleton
-    cv2.imwrite(osp.join(render_save_path, file_name + '_skeleton.jpg'), vis_skeleton)
+        # save 2D skeleton
+        cv2.imwrite(osp.join(render_save_path, file_name + '_skeleton.jpg'), vis_skeleton)
    
-    # save render
-    cv2.imwrite(osp.join(render_save_path, file_name + '_mesh.jpg'), render_out[0].cpu().numpy())
-
+        # save render
+        cv2.imwrite(osp.join(render_save_path, file_name + '_mesh.jpg'), render_out[0].cpu().numpy())
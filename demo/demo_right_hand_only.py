@@ -107,7 +107,7 @@ for img_path in tqdm(img_path_list):
     joint_img_xy1 = np.concatenate((joint_img[:,:2], np.ones_like(joint_img[:,:1])),1)
     joint_img = np.dot(bb2img_trans, joint_img_xy1.transpose(1,0)).transpose(1,0)
     color = (255,0,255) # purple
-    vis_skeleton = vis_keypoints_with_skeleton(original_img[:,:,::-1].copy(), joint_img, mano.sh_skeleton, color)
+    vis_skeleton = vis_keypoints_with_skeleton(original_img[:,:,::-1].copy(), joint_img, mano.sh_skeleton_arr, color)
 
     # save mesh
     save_obj(mesh, mano.face['right'], osp.join(mesh_save_path, file_name + '_right.obj'))